@@ -1,161 +1,321 @@
 import streamlit as st
-from docx import Document
 import re
 import io
-import base64
+import zipfile
+import xml.etree.ElementTree as ET
+
+# --- Compiled Patterns ---
+
+# Split point between options, capturing the 'B. ', 'C. ', 'D. ' markers
+_BCD_SPLIT_RE = re.compile(r'([B-D]\. )')
+
+# Answer lines (e.g., '✅ Answer: B. ...')
+_ANSWER_PREFIX = '✅ Answer:'
+
+# Lowercase prefixes of option text that was split onto its own paragraph
+_CONT_PREFIXES = ('to increase profit', 'they eliminate human', 'using encryption to')
+_CONT_PREFIX_LEN = max(len(prefix) for prefix in _CONT_PREFIXES)
+
+# --- Quiz Line Kinds and Parser States ---
+
+_LINE_Q = 'Q'        # Question line
+_LINE_OPT = 'OPT'    # Option line
+_LINE_ANS = 'ANS'    # Answer line
+_LINE_CONT = 'CONT'  # Continuation of a split option
+
+_SEEK_Q = 'SEEK_Q'      # Waiting for the next question
+_IN_OPTS = 'IN_OPTS'    # Collecting the current question's option lines
+_SEEK_ANS = 'SEEK_ANS'  # Question emitted, its answer may follow
+
+# --- DOCX XML Tags ---
+
+_RELS_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+_RELATIONSHIP = _RELS_NS + 'Relationship'
+# Transitional and strict OOXML both end the main document relationship type this way
+_OFFICE_DOCUMENT_REL_SUFFIX = '/officeDocument'
+
+_W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_W_P = _W_NS + 'p'
+_W_R = _W_NS + 'r'
+_W_HYPERLINK = _W_NS + 'hyperlink'
+_W_T = _W_NS + 't'
+_W_BR = _W_NS + 'br'
+_W_TYPE = _W_NS + 'type'
+# Run children other than <w:t> that python-docx renders as text in Paragraph.text
+_W_RUN_CHARS = {
+    _W_NS + 'tab': '\t',
+    _W_NS + 'ptab': '\t',
+    _W_NS + 'cr': '\n',
+    _W_NS + 'noBreakHyphen': '-',
+}
 
 # --- Core Logic Functions ---
 
+def _is_question(text):
+    """Checks for a question line prefix: one or two digits followed by '. '."""
+    n = len(text)
+    return n >= 3 and text[0].isdecimal() and (
+        (text[1] == '.' and text[2] == ' ') or
+        (n >= 4 and text[1].isdecimal() and text[2] == '.' and text[3] == ' ')
+    )
+
+def _is_option(text):
+    """Checks for an option line prefix: a letter A-D followed by '. '."""
+    return len(text) >= 3 and text[0] in 'ABCD' and text[1] == '.' and text[2] == ' '
+
+def _repair_mojibake(text):
+    """
+    Undoes UTF-8 text that was mis-decoded as cp1252 (e.g. 'âœ…' back to '✅').
+    Text that doesn't round-trip cleanly is returned unchanged.
+    """
+    if 'â' not in text:
+        return text
+    try:
+        return text.encode('cp1252').decode('utf-8')
+    except UnicodeError:
+        return text
+
+def _paragraph_text(p):
+    """Returns the text of a <w:p> element, including runs nested in hyperlinks."""
+    pieces = []
+    for child in p:
+        if child.tag == _W_HYPERLINK:
+            runs = child.iterfind(_W_R)
+        elif child.tag == _W_R:
+            runs = (child,)
+        else:
+            continue
+        for run in runs:
+            for item in run:
+                if item.tag == _W_T:
+                    pieces.append(item.text or '')
+                elif item.tag == _W_BR:
+                    # Only line breaks count; page and column breaks render as nothing
+                    if item.get(_W_TYPE, 'textWrapping') == 'textWrapping':
+                        pieces.append('\n')
+                elif item.tag in _W_RUN_CHARS:
+                    pieces.append(_W_RUN_CHARS[item.tag])
+    return ''.join(pieces)
+
+def _main_document_part(archive):
+    """Returns the zip member name of the main document part, as named in _rels/.rels."""
+    rels = ET.fromstring(archive.read('_rels/.rels'))
+    for rel in rels.iter(_RELATIONSHIP):
+        if rel.get('Type', '').endswith(_OFFICE_DOCUMENT_REL_SUFFIX):
+            # Targets in the package-level rels are relative to the package root
+            return rel.get('Target').lstrip('/')
+    raise KeyError("no officeDocument relationship in '_rels/.rels'")
+
+def _iter_docx_paragraphs(docx_file):
+    """
+    Streams the text of each top-level body paragraph of a DOCX file.
+
+    The main document part (usually word/document.xml) is read with iterparse and every finished body element is
+    cleared, so memory stays flat regardless of document size.
+    """
+    with zipfile.ZipFile(docx_file) as archive, archive.open(_main_document_part(archive)) as xml_file:
+        depth = 0
+        for event, elem in ET.iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            # <w:document> -> <w:body> -> <w:p>: body children end at depth 2
+            if depth == 2:
+                if elem.tag == _W_P:
+                    yield _paragraph_text(elem)
+                elem.clear()
+
+def _classify_line(text):
+    """
+    Classifies a stripped, non-empty paragraph of a quiz document.
+
+    Returns:
+        str: One of _LINE_Q, _LINE_OPT, _LINE_ANS or _LINE_CONT, or None if the
+            line is not part of the quiz.
+    """
+    # Check for the distinct patterns based on the structure provided in the first prompt
+    
+    # Question lines (e.g., '1. What is...')
+    if _is_question(text):
+        return _LINE_Q
+    
+    # Answer lines (e.g., '✅ Answer: B. ...')
+    if text.startswith(_ANSWER_PREFIX):
+        return _LINE_ANS
+    
+    # Options (A. B. C. D. lines)
+    if _is_option(text):
+        return _LINE_OPT
+    
+    # Option text that was split onto its own paragraph
+    if text[:_CONT_PREFIX_LEN].lower().startswith(_CONT_PREFIXES):
+        return _LINE_CONT
+    
+    return None
+
 def extract_quiz_content_from_docx(docx_file):
     """
-    Reads DOCX content from a BytesIO object (from Streamlit upload) and extracts
-    quiz content based on the provided structure.
+    Reads DOCX content from a file-like object (from Streamlit upload) and lazily
+    yields classified quiz lines based on the provided structure.
 
     Args:
-        docx_file: A file-like object (BytesIO) of the uploaded DOCX.
+        docx_file: A seekable file-like object (e.g. Streamlit's UploadedFile) of the uploaded DOCX.
 
-    Returns:
-        list: A list of cleaned strings, containing questions, options, and answers.
+    Yields:
+        tuple: A (kind, text) pair, where kind is one of _LINE_Q, _LINE_OPT, _LINE_ANS
+            or _LINE_CONT and text is non-empty and stripped of surrounding whitespace.
+
+    Errors from a corrupt or truncated DOCX are raised while iterating, possibly after
+    some lines were already yielded, so callers must discard any partial output.
     """
-    try:
-        document = Document(docx_file)
-        content_lines = []
-
-        # Iterate through all paragraphs in the document
-        for para in document.paragraphs:
-            text = para.text.strip()
-            if text:
-                # Check for the distinct patterns based on the structure provided in the first prompt
-                
-                # Question lines (e.g., '1. What is...')
-                if re.match(r'^\d{1,2}\. .*', text):
-                    content_lines.append(text)
-                
-                # Answer lines (e.g., '✅ Answer: B. ...')
-                elif text.startswith('✅ Answer:'):
-                    content_lines.append(text)
-                
-                # Options (A. B. C. D. lines) or split continuations
-                elif re.match(r'^[A-D]\. .*', text) or \
-                     text.lower().startswith('to increase profit') or \
-                     text.lower().startswith('they eliminate human') or \
-                     text.lower().startswith('using encryption to'):
-                    content_lines.append(text)
-
-        return content_lines
-    except Exception as e:
-        st.error(f"Error reading DOCX file: {e}")
-        return []
-
-def generate_quiz_html(quiz_content_lines):
+    # Iterate through all paragraphs in the document
+    for para_text in _iter_docx_paragraphs(docx_file):
+        text = _repair_mojibake(para_text.strip())
+        if text:
+            kind = _classify_line(text)
+            if kind is not None:
+                yield kind, text
+
+def _write_question_html(buf, question_block):
+    """
+    Parses a combined question block (the question line followed by its option lines),
+    writes its header and options HTML to buf, and returns the question as a dict.
+    """
+    # The block starts with a question line, so the number is the digits before its dot
+    dot = question_block.find('.')
+    q_num = question_block[:dot]
+    
+    # Extract question text and options by splitting at the first option 'A.'
+    a_pos = question_block.find("A.")
+    if a_pos != -1:
+        # Question text is everything between the number/dot and 'A.'
+        q_text = question_block[dot + 1:a_pos].strip()
+        options_block = question_block[a_pos:].strip()
+        
+        # Short-circuit: with no B., C. or D. marker the whole block is option A
+        if 'B. ' not in options_block and 'C. ' not in options_block and 'D. ' not in options_block:
+            final_options = [options_block]
+        else:
+            # Split options by B., C., D. while preserving A.
+            options_list = _BCD_SPLIT_RE.split(options_block)
+            
+            # Reconstruct options list properly: [A. optA, B. optB, C. optC, D. optD]
+            final_options = []
+            temp_opt_parts = []
+            for item in options_list:
+                if _is_option(item):
+                    if temp_opt_parts:
+                        final_options.append(''.join(temp_opt_parts).strip())
+                    temp_opt_parts = [item]
+                else:
+                    temp_opt_parts.append(item)
+            if temp_opt_parts:
+                final_options.append(''.join(temp_opt_parts).strip())
+
+    else:
+        q_text = question_block[dot + 1:].strip()
+        final_options = []
+
+
+    current_question = {
+        "number": q_num,
+        "text": q_text,
+        "options": final_options,
+        "answer": ""
+    }
+    
+    # HTML for Question Header
+    buf.write(f'\n<p>{q_num}. <b>')
+    buf.write(current_question["text"])
+    buf.write('</b></p>')
+
+    # HTML for Options
+    for opt in current_question["options"]:
+        if opt:
+            buf.write('\n<p>• ')
+            buf.write(opt)
+            buf.write('</p>')
+
+    return current_question
+
+def generate_quiz_html(quiz_lines):
     """
-    Extracts quiz questions and answers from a list of lines (from DOCX)
-    and formats them into an HTML string structure.
+    Extracts quiz questions and answers from classified (kind, text) lines, as yielded
+    by extract_quiz_content_from_docx, and formats them into an HTML string structure.
+
+    The lines are consumed in a single pass. Returns an empty string if there were none.
     """
-    html_output = []
-    current_question = {}
-    in_question_block = False
+    # Every element is written with a leading newline, after one blank line up front
+    buf = io.StringIO()
+    buf.write('\n')
+    current_question = None
+    question_block_parts = []
+    state = _SEEK_Q
+    has_lines = False
     
-    i = 0
-    while i < len(quiz_content_lines):
-        line = quiz_content_lines[i].strip()
+    for kind, line in quiz_lines:
+        has_lines = True
         
-        if not line:
-            i += 1
+        if state == _IN_OPTS:
+            # Combine the question line with the following option line(s)
+            if kind == _LINE_OPT or kind == _LINE_CONT:
+                question_block_parts.append(line)
+                continue
+            
+            # A new question or an answer ends the option block
+            current_question = _write_question_html(buf, ''.join(question_block_parts))
+            state = _SEEK_ANS
+
+        # Process the answer directly following the question block
+        if state == _SEEK_ANS and kind == _LINE_ANS:
+            # Extract the answer text, removing "✅  Answer: X. "
+            current_question["answer"] = line.split(":", 1)[-1].strip()
+            state = _SEEK_Q
             continue
 
         # Start of a new question: e.g., "1. What is..."
-        if re.match(r'^\d{1,2}\. .*', line):
-            if in_question_block:
+        # Anything else outside a question block is skipped
+        if kind == _LINE_Q:
+            if current_question is not None:
                 # Close the previous question block
-                html_output.append(f'<p><b>✔ Correct Answer</b>: {current_question["answer"]}</p>')
-            
-            in_question_block = True
-            parts = line.split('.', 1)
-            q_num = parts[0].strip()
-            
-            # Combine the question line with the following option line(s)
-            question_block = line
-            next_index = i + 1
-            while next_index < len(quiz_content_lines) and not re.match(r'^\d{1,2}\. .*|✅ Answer:.*', quiz_content_lines[next_index].strip()):
-                 question_block += quiz_content_lines[next_index].strip()
-                 next_index += 1
+                buf.write('\n<p><b>✔ Correct Answer</b>: ')
+                buf.write(current_question["answer"])
+                buf.write('</p>')
             
-            # Extract question text and options by splitting at the first option 'A.'
-            a_pos = question_block.find("A.")
-            if a_pos != -1:
-                # Question text is everything between the number/dot and 'A.'
-                q_text = question_block.split('.', 1)[1][:a_pos - len(question_block.split('.', 1)[0]) - 1].strip()
-                options_block = question_block[a_pos:].strip()
-                
-                # Split options by B., C., D. while preserving A.
-                options_list = re.split(r'([B-D]\. )', options_block)
-                
-                # Reconstruct options list properly: [A. optA, B. optB, C. optC, D. optD]
-                final_options = []
-                temp_opt = ""
-                for item in options_list:
-                    if re.match(r'^[A-D]\. ', item):
-                        if temp_opt:
-                            final_options.append(temp_opt.strip())
-                        temp_opt = item
-                    else:
-                        temp_opt += item
-                if temp_opt:
-                    final_options.append(temp_opt.strip())
-
-            else:
-                q_text = question_block.split('.', 1)[1].strip()
-                final_options = []
-
-
-            current_question = {
-                "number": q_num,
-                "text": q_text,
-                "options": final_options,
-                "answer": ""
-            }
-            
-            # HTML for Question Header
-            html_output.append(f'<p>{q_num}. <b>{current_question["text"]}</b></p>')
-
-            # HTML for Options
-            for opt in current_question["options"]:
-                if opt:
-                    html_output.append(f'<p>• {opt}</p>')
-
-
-            # Process the answer
-            answer_index = next_index
-            if answer_index < len(quiz_content_lines) and quiz_content_lines[answer_index].strip().startswith("✅ Answer:"):
-                answer_line = quiz_content_lines[answer_index].strip()
-                
-                # Extract the answer text, removing "✅  Answer: X. "
-                answer_text = answer_line.split(":", 1)[-1].strip()
-                # Use regex to find the answer option letter and text
-                match = re.match(r'([A-D]\. )?(.+)', answer_text)
-                if match:
-                    current_question["answer"] = answer_text
-                
-                # Update 'i' to the line *after* the answer
-                i = answer_index
-            else:
-                # Update 'i' to the line *before* the next question/answer
-                i = next_index - 1
-        
-        i += 1
+            question_block_parts = [line]
+            state = _IN_OPTS
+
+    if not has_lines:
+        return ''
+
+    # Flush a question block left open at the end of the document
+    if state == _IN_OPTS:
+        current_question = _write_question_html(buf, ''.join(question_block_parts))
 
     # Add the final question's answer
-    if in_question_block:
-        html_output.append(f'<p><b>✔ Correct Answer</b>: {current_question["answer"]}</p>')
+    if current_question is not None:
+        buf.write('\n<p><b>✔ Correct Answer</b>: ')
+        buf.write(current_question["answer"])
+        buf.write('</p>')
 
-    return '\n\n' + '\n'.join(html_output)
+    return buf.getvalue()
 
-def generate_full_html_template(quiz_html_content):
-    """Generates the full HTML file content by inserting the quiz content."""
-    
-    # Using f-string for template insertion, escaping CSS with double curly braces {{}}
-    full_html_template = f"""
+@st.cache_data(show_spinner=False, max_entries=32, ttl=3600)
+def convert_docx_to_quiz_html(docx_bytes):
+    """
+    Converts raw DOCX bytes into the quiz HTML content block.
+
+    Cached on the file content, so Streamlit reruns and repeated uploads of the same
+    document skip the DOCX parse and HTML generation entirely. The cache keeps at most
+    32 results for up to an hour each. Errors reading the DOCX are raised rather than cached.
+    """
+    return generate_quiz_html(extract_quiz_content_from_docx(io.BytesIO(docx_bytes)))
+
+# --- HTML Template ---
+
+# Static halves of the output page, split where the quiz content is inserted
+_HTML_PREFIX = """
 <!doctype html>
 <html lang="en">
 
@@ -163,62 +323,77 @@ def generate_full_html_template(quiz_html_content):
 
     <meta charset="utf-8">
     <meta name="viewport" content="width=device-width, initial-scale=1">
-    <link href="https://cdn.jsdelivr.net/npm/bootstrap@5.0.2/dist/css/bootstrap.min.css" rel="stylesheet"
-        integrity="sha384-EVSTQN3/azprG1Anm3QDgpJLIm9Nao0Yz1ztcQTwFspd3yD65VohhpuuCOmLASjC" crossorigin="anonymous">
-    <link href="https://fonts.googleapis.com/css2?family=Red+Hat+Display:wght@400;700&display=swap" rel="stylesheet">
+    <!-- Subset of Bootstrap 5.0.2 used by this page, inlined to avoid render-blocking CDN requests -->
+    <style>
+        *, ::after, ::before { box-sizing: border-box; }
+        body { margin: 0; font-size: 1rem; font-weight: 400; line-height: 1.5; color: #212529; background-color: #fff; -webkit-text-size-adjust: 100%; }
+        h2 { margin-top: 0; margin-bottom: .5rem; font-weight: 500; line-height: 1.2; font-size: calc(1.325rem + .9vw); }
+        p { margin-top: 0; margin-bottom: 1rem; }
+        b, strong { font-weight: bolder; }
+        a { color: #0d6efd; text-decoration: underline; }
+        a:hover { color: #0a58ca; }
+        img { vertical-align: middle; }
+        .container { width: 100%; padding-right: .75rem; padding-left: .75rem; margin-right: auto; margin-left: auto; }
+        .text-center { text-align: center !important; }
+        @media (min-width: 576px) { .container { max-width: 540px; } }
+        @media (min-width: 768px) { .container { max-width: 720px; } }
+        @media (min-width: 992px) { .container { max-width: 960px; } }
+        @media (min-width: 1200px) { .container { max-width: 1140px; } h2 { font-size: 2rem; } }
+        @media (min-width: 1400px) { .container { max-width: 1320px; } }
+    </style>
 
     <style>
-        img.capdevlogo {{
+        img.capdevlogo {
             position: relative;
             left: 55px;
             top: 12px;
-        }}
+        }
     </style>
 
     <style>
-        img.harbingerlogo {{
+        img.harbingerlogo {
             position: relative;
             right: -450px;
             top: 11px;
-        }}
+        }
     </style>
     <title> Pro Coder Quiz </title>
     <style>
-        body {{
+        body {
             border: 2px solid #1D3557;
             border-radius: 20px;
             margin: 30px;
             background-color: white;
             font-family: 'Red Hat Display', sans-serif;
-        }}
+        }
 
-        .logo-wrapper {{
+        .logo-wrapper {
             display: flex;
             justify-content: space-between;
             align-items: center;
             padding: 20px 0;
-        }}
+        }
 
-        .title-wrapper {{
+        .title-wrapper {
             background-color: #E63946;
             color: #fff;
             padding: 10px;
             margin-bottom: 40px;
-        }}
+        }
 
-        .title-wrapper h2 {{
+        .title-wrapper h2 {
             font-weight: 700;
             margin: 0;
-        }}
+        }
 
-        .congrats {{
+        .congrats {
             font-weight: 300;
             font-size: 32px;
             position: relative;
             margin-bottom: 30px;
-        }}
+        }
 
-        .congrats::after {{
+        .congrats::after {
             content: '';
             height: 5px;
             width: 8%;
@@ -227,11 +402,11 @@ def generate_full_html_template(quiz_html_content):
             top: calc(100% + 5px);
             border-radius: 3px;
             left: 0px;
-        }}
+        }
 
-        .text-blue {{
+        .text-blue {
             color: #1D3557;
-        }}
+        }
     </style>
 </head>
 
@@ -258,7 +433,9 @@ def generate_full_html_template(quiz_html_content):
 
     <div class="container">
    
-{quiz_html_content}
+"""
+
+_HTML_SUFFIX = """
 
 </div>
 
@@ -272,7 +449,10 @@ def generate_full_html_template(quiz_html_content):
 </body>
 </html>
 """
-    return full_html_template
+
+def generate_full_html_template(quiz_html_content):
+    """Generates the full HTML file content by inserting the quiz content."""
+    return ''.join((_HTML_PREFIX, quiz_html_content, _HTML_SUFFIX))
 
 
 # --- Streamlit UI ---
@@ -288,34 +468,36 @@ def main():
     uploaded_file = st.file_uploader("Upload Word File (DOCX)", type=['docx'])
 
     if uploaded_file is not None:
-        # Read the file content into a BytesIO object for python-docx
-        docx_content = io.BytesIO(uploaded_file.getvalue())
-        
-        # 1. Extract content
+        # 1-2. Extract content and generate the HTML content block in a single pass,
+        # cached on the uploaded bytes so reruns don't re-parse the DOCX
         with st.spinner('Extracting quiz content...'):
-            quiz_data_lines = extract_quiz_content_from_docx(docx_content)
-
-        if quiz_data_lines:
-            # 2. Generate HTML content block
-            quiz_html_content = generate_quiz_html(quiz_data_lines)
-            
+            try:
+                quiz_html_content = convert_docx_to_quiz_html(uploaded_file.getvalue())
+            except Exception as e:
+                # Discard anything generated before the failure
+                st.error(f"Error reading DOCX file: {e}")
+                quiz_html_content = ''
+
+        if quiz_html_content:
             # 3. Generate Full HTML file
             final_html = generate_full_html_template(quiz_html_content)
 
             st.success("✅ Conversion Complete!")
             
             # 4. Provide Download Button
-            # Encode HTML string for download
+            # Encode HTML string for download; Streamlit serves the bytes directly
             html_bytes = final_html.encode('utf-8')
-            b64 = base64.b64encode(html_bytes).decode()
-            
-            download_link = f'<a href="data:file/html;base64,{b64}" download="ProCoder_Quiz_Output.html">Click to Download HTML File</a>'
             
-            st.markdown(download_link, unsafe_allow_html=True)
+            st.download_button(
+                label="Click to Download HTML File",
+                data=html_bytes,
+                file_name="ProCoder_Quiz_Output.html",
+                mime="text/html",
+            )
             
             st.subheader("Preview of Generated HTML Quiz Section")
-            # Display a sanitized preview for verification
-            st.markdown(quiz_html_content.replace('<b>', '**').replace('</b>', '**'), unsafe_allow_html=True)
+            # Display a preview for verification; <b> tags render as-is with unsafe_allow_html
+            st.markdown(quiz_html_content, unsafe_allow_html=True)
 
         else:
             st.warning("Could not extract quiz questions. Please ensure your DOCX file follows the expected format.")